@@ -2,14 +2,26 @@
 QuikTalk - Real-Time Chat Application
 Main application file with enhanced features
 """
+# Patch the standard library before anything imports socket or threading.
+# The Redis message queue and the Redis DM history both need green sockets;
+# without them RedisManager refuses to start and Redis calls block the hub.
+import eventlet
+eventlet.monkey_patch()
+
 from flask import Flask, render_template, request
-from flask_socketio import SocketIO, send, emit, join_room, leave_room
+from functools import lru_cache
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from engineio import packet as eio_packet
+from socketio import packet as socketio_packet
+import redis
+import threading
 import time
 
 # Import services
 from services.encryption import EncryptionService
-from services.logger import LoggerService
+from services.logger import get_logger
 from services.rooms import RoomService
+from services.serializer import JSONSerializer
 
 # Import handlers
 from handlers.message_handler import MessageHandler
@@ -20,32 +32,125 @@ from handlers.private_message_handler import PrivateMessageHandler
 # Import configuration
 from config import get_config
 
+# Shared constants
+GENERAL_ROOM = 'general'
+SYSTEM_PREFIX = 'System: '
+
 # Initialize Flask app
 app = Flask(__name__)
 config = get_config()
 app.config['SECRET_KEY'] = config.SECRET_KEY
 
 # Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins=config.CORS_ALLOWED_ORIGINS)
+socketio = SocketIO(
+    app,
+    cors_allowed_origins=config.CORS_ALLOWED_ORIGINS,
+    message_queue=config.MESSAGE_QUEUE_URL,
+    json=JSONSerializer
+)
 
 # Initialize services
-logger = LoggerService(
+logger = get_logger(
     log_dir=config.LOG_DIR,
     log_file=config.LOG_FILE,
     log_level=config.LOG_LEVEL
 )
 encryption = EncryptionService(master_key=config.SECRET_KEY)
 room_service = RoomService(default_room=config.DEFAULT_ROOM)
+redis_client = redis.Redis.from_url(config.REDIS_URL) if config.REDIS_URL else None
 
 # Initialize handlers
-message_handler = MessageHandler(max_message_length=config.MAX_MESSAGE_LENGTH)
+message_handler = MessageHandler(
+    max_message_length=config.MAX_MESSAGE_LENGTH,
+    batch_size=config.MESSAGE_BATCH_SIZE,
+    sleep=socketio.sleep
+)
 user_handler = UserHandler(logger=logger)
 room_handler = RoomHandler(room_service=room_service, logger=logger)
-pm_handler = PrivateMessageHandler(encryption_service=encryption, logger=logger)
+pm_handler = PrivateMessageHandler(
+    encryption_service=encryption,
+    logger=logger,
+    redis_client=redis_client
+)
+
+# Background task that flushes batched room messages
+flush_task = None
+flush_task_lock = threading.Lock()
 
 logger.info("QuikTalk application initialized successfully")
 
 
+# ============ BATCHED BROADCASTS ============
+def batched_emit(event, payload, room=None, batch=config.BROADCAST_CHUNK_SIZE):
+    """
+    Emit an event to a room (or to everyone when room is None), yielding
+    to other greenlets between chunks of recipients in large rooms.
+    
+    The packet is encoded once and the prebuilt engine.io packets are
+    handed to every recipient through _send_eio_packet, the same hook
+    socketio.emit(to=room) uses, so only the yields differ. With a message
+    queue configured the event is handed to the queue instead, which fans
+    it out to the clients of every worker.
+    """
+    if config.MESSAGE_QUEUE_URL:
+        socketio.emit(event, payload, to=room)
+        return
+    
+    server = socketio.server
+    if room not in server.manager.rooms.get('/', {}):
+        return
+    
+    eio_sids = [eio_sid for _, eio_sid in server.manager.get_participants('/', room)]
+    
+    encoded = server.packet_class(socketio_packet.EVENT, namespace='/', data=[event, payload]).encode()
+    if not isinstance(encoded, list):
+        encoded = [encoded]
+    eio_packets = [eio_packet.Packet(eio_packet.MESSAGE, data) for data in encoded]
+    
+    for start in range(0, len(eio_sids), batch):
+        if start:
+            socketio.sleep(0)
+        for eio_sid in eio_sids[start:start + batch]:
+            for pkt in eio_packets:
+                server._send_eio_packet(eio_sid, pkt)
+
+
+def encrypt_batch(room, messages):
+    """Encrypt the messages of a batch that requested it in one call."""
+    to_encrypt = [m for m in messages if m['encrypted']]
+    if not to_encrypt:
+        return
+    
+    try:
+        encrypted = encryption.encrypt_batch_for_room(room, [m['content'] for m in to_encrypt])
+    except Exception as e:
+        logger.error("Encryption failed: %s", e)
+        # Sent in the clear, so don't claim otherwise
+        for message in to_encrypt:
+            message['encrypted'] = False
+        return
+    
+    for message, content in zip(to_encrypt, encrypted):
+        message['content'] = content
+
+
+def flush_pending_messages():
+    """Encrypt, store and emit each room's queued messages as a single batch."""
+    for room, messages in message_handler.drain_pending().items():
+        encrypt_batch(room, messages)
+        for message in messages:
+            room_service.add_message_to_history(room, message)
+        batched_emit('receive_message_batch', messages, room=room)
+
+
+def message_flush_loop():
+    """Flush queued room messages every MESSAGE_FLUSH_INTERVAL_MS."""
+    interval = config.MESSAGE_FLUSH_INTERVAL_MS / 1000
+    while True:
+        socketio.sleep(interval)
+        flush_pending_messages()
+
+
 # ============ ROUTES ============
 @app.route('/')
 def home():
@@ -55,19 +160,25 @@ def home():
 # ============ CONNECTION EVENTS ============
 @socketio.on('connect')
 def handle_connect():
-    logger.info(f"New connection: {request.sid}")
+    global flush_task
+    with flush_task_lock:
+        if flush_task is None:
+            flush_task = socketio.start_background_task(message_flush_loop)
+    
+    logger.info("New connection: %s", request.sid)
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    user = user_handler.unregister_user(request.sid)
+    sid = request.sid
+    user = user_handler.unregister_user(sid)
     if user:
         # Leave all rooms
-        left_rooms = room_handler.handle_disconnect(request.sid, user.display_name)
+        left_rooms = room_handler.handle_disconnect(sid, user.display_name)
         
         # Notify others
-        send(f"System: {user.display_name} has left the chat", broadcast=True)
-        emit('update_user_list', user_handler.get_user_list(), broadcast=True)
+        batched_emit('message', SYSTEM_PREFIX + user.display_name + " has left the chat")
+        batched_emit('update_user_list', user_handler.get_user_list())
         
         # Notify room members
         for room_id in left_rooms:
@@ -79,14 +190,15 @@ def handle_disconnect():
 
 @socketio.on('set_username')
 def handle_set_username(username):
-    user = user_handler.register_user(request.sid, username)
+    sid = request.sid
+    user = user_handler.register_user(sid, username)
     
     # Auto-join general room
-    room_handler.join_room('general', request.sid, user.display_name)
-    join_room('general')
+    room_handler.join_room(GENERAL_ROOM, sid, user.display_name)
+    join_room(GENERAL_ROOM)
     
-    send(f"System: {user.display_name} has joined the chat", broadcast=True)
-    emit('update_user_list', user_handler.get_user_list(), broadcast=True)
+    batched_emit('message', SYSTEM_PREFIX + user.display_name + " has joined the chat")
+    batched_emit('update_user_list', user_handler.get_user_list())
     emit('username_set', {'username': user.display_name})
     
     # Send room list
@@ -97,19 +209,19 @@ def handle_set_username(username):
 # ============ MESSAGE EVENTS ============
 @socketio.on('message')
 def handle_message(data):
-    username = user_handler.get_username(request.sid)
+    sid = request.sid
+    username = user_handler.get_username(sid)
     if not username:
         return
     
     # Handle both string and dict messages
     if isinstance(data, str):
         msg = data
-        room = 'general'
+        room = GENERAL_ROOM
         encrypt = False
     else:
-        msg = data.get('message', '')
-        room = data.get('room', 'general')
-        encrypt = data.get('encrypt', False)
+        get = data.get
+        msg, room, encrypt = get('message', ''), get('room', GENERAL_ROOM), get('encrypt', False)
     
     # Validate message
     is_valid, error = message_handler.validate_message(msg)
@@ -117,28 +229,22 @@ def handle_message(data):
         emit('error', {'message': error})
         return
     
-    # Encrypt if requested
-    if encrypt:
-        try:
-            msg = encryption.encrypt_for_room(room, msg)
-        except Exception as e:
-            logger.error(f"Encryption failed: {e}")
-    
-    # Format and store message
+    # Format message (encryption and history storage happen per batch on flush)
     formatted = message_handler.format_message(username, msg, room, encrypted=encrypt)
-    room_service.add_message_to_history(room, formatted)
     
     # Log the message
     logger.log_message(username, 'broadcast', room)
     
-    # Broadcast to room
-    emit('receive_message', formatted, room=room)
+    # Queue for the next batched broadcast, flushing early if the batch is full
+    if message_handler.queue_broadcast(room, formatted):
+        socketio.start_background_task(flush_pending_messages)
 
 
 # ============ ROOM EVENTS ============
 @socketio.on('create_room')
 def handle_create_room(data):
-    username = user_handler.get_username(request.sid)
+    sid = request.sid
+    username = user_handler.get_username(sid)
     if not username:
         return
     
@@ -146,17 +252,18 @@ def handle_create_room(data):
     emit('room_created', result)
     
     if result['success']:
-        emit('room_list', room_handler.get_rooms(), broadcast=True)
+        batched_emit('room_list', room_handler.get_rooms())
 
 
 @socketio.on('join_room')
 def handle_join_room(data):
-    username = user_handler.get_username(request.sid)
+    sid = request.sid
+    username = user_handler.get_username(sid)
     if not username:
         return
     
-    room_id = data.get('room_id', 'general')
-    result = room_handler.join_room(room_id, request.sid, username)
+    room_id = data.get('room_id', GENERAL_ROOM)
+    result = room_handler.join_room(room_id, sid, username)
     
     if result['success']:
         join_room(room_id)
@@ -169,16 +276,17 @@ def handle_join_room(data):
 
 @socketio.on('leave_room')
 def handle_leave_room(data):
-    username = user_handler.get_username(request.sid)
+    sid = request.sid
+    username = user_handler.get_username(sid)
     if not username:
         return
     
     room_id = data.get('room_id')
-    if room_id == 'general':
+    if room_id == GENERAL_ROOM:
         emit('error', {'message': 'Cannot leave the general room'})
         return
     
-    result = room_handler.leave_room(room_id, request.sid, username)
+    result = room_handler.leave_room(room_id, sid, username)
     
     if result['success']:
         leave_room(room_id)
@@ -197,7 +305,7 @@ def handle_get_rooms():
 
 @socketio.on('get_room_members')
 def handle_get_room_members(data):
-    room_id = data.get('room_id', 'general')
+    room_id = data.get('room_id', GENERAL_ROOM)
     result = room_handler.get_room_members(room_id)
     emit('room_members', result)
 
@@ -205,7 +313,8 @@ def handle_get_room_members(data):
 # ============ PRIVATE MESSAGE EVENTS ============
 @socketio.on('private_message')
 def handle_private_message(data):
-    sender = user_handler.get_username(request.sid)
+    sid = request.sid
+    sender = user_handler.get_username(sid)
     if not sender:
         return
     
@@ -230,7 +339,8 @@ def handle_private_message(data):
 
 @socketio.on('get_conversation')
 def handle_get_conversation(data):
-    username = user_handler.get_username(request.sid)
+    sid = request.sid
+    username = user_handler.get_username(sid)
     if not username:
         return
     
@@ -238,7 +348,7 @@ def handle_get_conversation(data):
     messages = pm_handler.get_conversation(username, other_user)
     
     # Decrypt messages
-    decrypted = [pm_handler.decrypt_message(m.copy()) for m in messages]
+    decrypted = [pm_handler.decrypt_message(m) for m in messages]
     
     emit('conversation_history', {
         'with_user': other_user,
@@ -247,17 +357,23 @@ def handle_get_conversation(data):
 
 
 # ============ UTILITY EVENTS ============
-@socketio.on('get_stats')
-def handle_get_stats():
-    stats = {
+@lru_cache(maxsize=1)
+def stats_for_period(period):
+    """Compute server stats once per STATS_CACHE_SECONDS period."""
+    return {
         'users_online': user_handler.user_count(),
         'rooms': room_service.room_count(),
         'log_stats': logger.get_log_stats()
     }
-    emit('stats', stats)
+
+
+@socketio.on('get_stats')
+def handle_get_stats():
+    period = int(time.time() // config.STATS_CACHE_SECONDS)
+    emit('stats', stats_for_period(period))
 
 
 # ============ RUN APPLICATION ============
 if __name__ == '__main__':
-    logger.info(f"Starting QuikTalk on {config.HOST}:{config.PORT}")
+    logger.info("Starting QuikTalk on %s:%s", config.HOST, config.PORT)
     socketio.run(app, debug=config.DEBUG, host=config.HOST, port=config.PORT)
@@ -17,6 +17,10 @@ class Config:
     
     # SocketIO settings
     CORS_ALLOWED_ORIGINS = "*"
+    MESSAGE_QUEUE_URL = os.environ.get('MESSAGE_QUEUE_URL', None)  # e.g. redis://localhost:6379/0
+    
+    # Redis settings (optional, enables persistent DM history)
+    REDIS_URL = os.environ.get('REDIS_URL', None)
     
     # Encryption settings
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY', None)
@@ -36,6 +40,14 @@ class Config:
     
     # Message history settings
     MESSAGE_HISTORY_LIMIT = 100
+    
+    # Broadcast batching settings
+    MESSAGE_FLUSH_INTERVAL_MS = 20
+    MESSAGE_BATCH_SIZE = 50
+    BROADCAST_CHUNK_SIZE = 50  # Recipients sent the prebuilt packet between yields
+    
+    # Stats settings
+    STATS_CACHE_SECONDS = 1
 
 
 class DevelopmentConfig(Config):
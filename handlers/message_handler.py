@@ -2,8 +2,10 @@
 Message Handler for processing chat messages
 """
 from collections import deque, OrderedDict
-from datetime import datetime
-from typing import Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
+import heapq
+import itertools
+import threading
 import time
 
 
@@ -16,21 +18,35 @@ class MessageHandler:
     - Message validation
     - Message formatting
     - Timestamp management
+    - Batched room broadcasts
     """
     
-    def __init__(self, max_message_length: int = 1000):
+    def __init__(self, max_message_length: int = 1000, batch_size: int = 50,
+                 sleep: Optional[Callable[[float], None]] = None):
         """
         Initialize the message handler.
         
         Args:
             max_message_length: Maximum allowed message length
+            batch_size: Number of pending messages that triggers an early flush
+            sleep: Cooperative sleep used for round robin time slices
+                   (e.g. socketio.sleep). No delay is applied if omitted.
         """
         self.max_message_length = max_message_length
+        self.batch_size = batch_size
+        self._sleep = sleep
         
-        # Message queues for different algorithms
+        # Messages waiting for the next batched broadcast, per room
+        self.pending_by_room: Dict[str, List[dict]] = {}
+        self._pending_lock = threading.Lock()
+        
+        # Message ID sequence, seeded with the start time so IDs stay unique across restarts
+        self._msg_seq = itertools.count(int(time.time() * 1000))
+        
+        # Message queues for different algorithms (FIFO shares the FCFS queue)
         self.fcfs_queue = deque()
-        self.fifo_queue = deque()
         self.lru_queue = OrderedDict()
+        self._lru_lock = threading.Lock()  # deque and heapq ops are atomic, LRU updates are not
         self.priority_queue = []
         self.round_robin_queue = deque()
         
@@ -47,16 +63,15 @@ class MessageHandler:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        if not message:
+        length = len(message) if message else 0
+        if not length:
             return False, "Message cannot be empty"
         
-        if len(message) > self.max_message_length:
+        if length > self.max_message_length:
             return False, f"Message exceeds maximum length of {self.max_message_length} characters"
         
-        # Strip whitespace
-        message = message.strip()
-        
-        if not message:
+        # Whitespace-only check without allocating a stripped copy
+        if message.isspace():
             return False, "Message cannot be empty"
         
         return True, ""
@@ -77,16 +92,44 @@ class MessageHandler:
             Formatted message dictionary
         """
         return {
-            'id': f"{username}_{int(time.time() * 1000)}",
+            'id': f"{username}_{next(self._msg_seq)}",
             'sender': username,
             'content': message,
             'room': room,
             'type': message_type,
             'encrypted': encrypted,
-            'timestamp': datetime.now().isoformat(),
             'unix_timestamp': time.time()
         }
     
+    def queue_broadcast(self, room: str, message: dict) -> bool:
+        """
+        Queue a formatted message for the next batched room broadcast.
+        
+        Args:
+            room: Room ID the message is sent to
+            message: Formatted message dictionary
+            
+        Returns:
+            True if this message filled the room's batch and a flush should
+            be scheduled. Later messages to the same batch return False, so
+            a flood schedules one flush rather than one per message.
+        """
+        with self._pending_lock:
+            pending = self.pending_by_room.setdefault(room, [])
+            pending.append(message)
+            return len(pending) == self.batch_size
+    
+    def drain_pending(self) -> Dict[str, List[dict]]:
+        """
+        Take all queued broadcasts, leaving the pending buffer empty.
+        
+        Returns:
+            Dictionary mapping room IDs to their queued messages
+        """
+        with self._pending_lock:
+            pending, self.pending_by_room = self.pending_by_room, {}
+        return pending
+    
     def add_to_queue(self, username: str, message: str, priority: int = 1) -> None:
         """
         Add a message to all scheduling queues.
@@ -101,14 +144,17 @@ class MessageHandler:
         
         # FCFS/FIFO queue
         self.fcfs_queue.append(msg_data)
-        self.fifo_queue.append(msg_data)
         
-        # LRU queue
-        self.lru_queue[(username, message)] = timestamp
+        # LRU queue (insertion order is recency order)
+        key = (username, message)
+        with self._lru_lock:
+            if key in self.lru_queue:
+                self.lru_queue.move_to_end(key)
+            else:
+                self.lru_queue[key] = None
         
-        # Priority queue
-        self.priority_queue.append((priority, timestamp, username, message))
-        self.priority_queue.sort(key=lambda x: (-x[0], x[1]))  # Higher priority first, then FIFO
+        # Priority queue (min-heap: higher priority first, then FIFO)
+        heapq.heappush(self.priority_queue, (-priority, timestamp, username, message))
         
         # Round Robin queue
         self.round_robin_queue.append(msg_data)
@@ -129,13 +175,12 @@ class MessageHandler:
         """
         Process message using FIFO algorithm.
         
+        FIFO and FCFS are the same ordering, so this shares the FCFS queue.
+        
         Returns:
             Tuple of (username, message) or None
         """
-        if self.fifo_queue:
-            username, message, _ = self.fifo_queue.popleft()
-            return username, message
-        return None
+        return self.process_fcfs()
     
     def process_lru(self) -> Optional[Tuple[str, str]]:
         """
@@ -144,11 +189,11 @@ class MessageHandler:
         Returns:
             Tuple of (username, message) or None
         """
-        if self.lru_queue:
-            # Get the least recently used (oldest timestamp)
-            lru_key = min(self.lru_queue, key=self.lru_queue.get)
-            del self.lru_queue[lru_key]
-            return lru_key
+        with self._lru_lock:
+            if self.lru_queue:
+                # The least recently used entry is always at the front
+                lru_key, _ = self.lru_queue.popitem(last=False)
+                return lru_key
         return None
     
     def process_round_robin(self, time_slice: float = 0.1) -> Optional[Tuple[str, str]]:
@@ -163,7 +208,8 @@ class MessageHandler:
         """
         if self.round_robin_queue:
             username, message, _ = self.round_robin_queue.popleft()
-            time.sleep(time_slice)  # Simulate time slice
+            if self._sleep:
+                self._sleep(time_slice)  # Simulate time slice without blocking the server
             return username, message
         return None
     
@@ -175,7 +221,7 @@ class MessageHandler:
             Tuple of (username, message) or None
         """
         if self.priority_queue:
-            priority, timestamp, username, message = self.priority_queue.pop(0)
+            _, _, username, message = heapq.heappop(self.priority_queue)
             return username, message
         return None
     
@@ -222,7 +268,7 @@ class MessageHandler:
         """Get the current size of all message queues."""
         return {
             'fcfs': len(self.fcfs_queue),
-            'fifo': len(self.fifo_queue),
+            'fifo': len(self.fcfs_queue),
             'lru': len(self.lru_queue),
             'priority': len(self.priority_queue),
             'round_robin': len(self.round_robin_queue)
@@ -231,7 +277,7 @@ class MessageHandler:
     def clear_queues(self) -> None:
         """Clear all message queues."""
         self.fcfs_queue.clear()
-        self.fifo_queue.clear()
-        self.lru_queue.clear()
+        with self._lru_lock:
+            self.lru_queue.clear()
         self.priority_queue.clear()
         self.round_robin_queue.clear()
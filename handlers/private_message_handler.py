@@ -1,25 +1,62 @@
 """
 Private Message Handler for direct messaging between users
 """
+from collections import Counter, deque
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional
+import itertools
 import time
 
+import orjson
+
 
 class PrivateMessageHandler:
-    """Handles private/direct messaging between users."""
+    """
+    Handles private/direct messaging between users.
+    
+    Conversation history is kept in Redis lists when a Redis client is
+    provided, so it survives restarts and is shared between workers.
+    Otherwise it is kept in memory.
+    """
+    
+    KEY_PREFIX = 'quiktalk:'
+    UNREAD_KEY = 'quiktalk:dm_unread'
+    ID_KEY = 'quiktalk:dm_next_id'
     
-    def __init__(self, encryption_service=None, logger=None):
+    def __init__(self, encryption_service=None, logger=None, redis_client=None):
         self.encryption = encryption_service
         self.logger = logger
-        self._conversations: Dict[str, List[dict]] = {}
+        self.redis = redis_client
+        self._conversations: Dict[str, Deque[dict]] = {}
+        self._unread: Counter = Counter()  # username -> unread message count
         self._history_limit = 100
+        
+        # In-memory message ID sequence, seeded with the start time so IDs stay
+        # unique across restarts. With Redis, IDs come from a shared counter.
+        self._msg_seq = itertools.count(int(time.time() * 1000))
     
     def _get_conversation_id(self, user1: str, user2: str) -> str:
         """Generate consistent conversation ID for two users."""
         users = sorted([user1, user2])
         return f"dm_{users[0]}_{users[1]}"
     
+    def _redis_key(self, conv_id: str) -> str:
+        """Get the Redis list key holding a conversation."""
+        return f"{self.KEY_PREFIX}{conv_id}"
+    
+    def _next_message_id(self) -> str:
+        """Get an ID that is unique across every process sharing the history."""
+        if self.redis is not None:
+            return f"pm_{self.redis.incr(self.ID_KEY)}"
+        return f"pm_{next(self._msg_seq)}"
+    
+    def _add_unread(self, username: str, delta: int) -> None:
+        """Adjust a user's unread message counter."""
+        if self.redis is not None:
+            self.redis.hincrby(self.UNREAD_KEY, username, delta)
+        else:
+            self._unread[username] += delta
+    
     def send_message(self, sender: str, receiver: str, content: str, encrypt: bool = True) -> dict:
         """Send a private message."""
         conv_id = self._get_conversation_id(sender, receiver)
@@ -32,7 +69,7 @@ class PrivateMessageHandler:
                 encrypt = False
         
         message = {
-            'id': f"pm_{int(time.time() * 1000)}",
+            'id': self._next_message_id(),
             'sender': sender,
             'receiver': receiver,
             'content': content,
@@ -41,14 +78,26 @@ class PrivateMessageHandler:
             'read': False
         }
         
-        # Store in history
-        if conv_id not in self._conversations:
-            self._conversations[conv_id] = []
-        self._conversations[conv_id].append(message)
+        # Store in history, newest first in Redis, trimmed to the limit
+        if self.redis is not None:
+            key = self._redis_key(conv_id)
+            pipe = self.redis.pipeline()
+            pipe.lindex(key, self._history_limit - 1)
+            pipe.lpush(key, orjson.dumps(message))
+            pipe.ltrim(key, 0, self._history_limit - 1)
+            raw_evicted = pipe.execute()[0]
+            evicted = orjson.loads(raw_evicted) if raw_evicted else None
+        else:
+            if conv_id not in self._conversations:
+                self._conversations[conv_id] = deque(maxlen=self._history_limit)
+            conversation = self._conversations[conv_id]
+            evicted = conversation[0] if len(conversation) == conversation.maxlen else None
+            conversation.append(message)
         
-        # Trim history
-        if len(self._conversations[conv_id]) > self._history_limit:
-            self._conversations[conv_id] = self._conversations[conv_id][-self._history_limit:]
+        # Messages trimmed from history can no longer be marked as read
+        self._add_unread(receiver, 1)
+        if evicted and not evicted['read']:
+            self._add_unread(evicted['receiver'], -1)
         
         if self.logger:
             self.logger.log_private_message(sender, receiver)
@@ -58,34 +107,58 @@ class PrivateMessageHandler:
     def get_conversation(self, user1: str, user2: str, limit: int = 50) -> List[dict]:
         """Get conversation history between two users."""
         conv_id = self._get_conversation_id(user1, user2)
-        messages = self._conversations.get(conv_id, [])
-        return messages[-limit:]
+        
+        if self.redis is not None:
+            raw_messages = self.redis.lrange(self._redis_key(conv_id), 0, limit - 1)
+            return [orjson.loads(raw) for raw in reversed(raw_messages)]
+        
+        messages = self._conversations.get(conv_id, ())
+        return list(messages)[-limit:]
     
     def decrypt_message(self, message: dict) -> dict:
-        """Decrypt a private message."""
-        if message.get('encrypted') and self.encryption:
-            try:
-                message['content'] = self.encryption.decrypt(message['content'])
-                message['encrypted'] = False
-            except Exception:
-                pass
-        return message
+        """Return a decrypted copy of a private message, leaving the stored one intact."""
+        if not (message.get('encrypted') and self.encryption):
+            return message
+        try:
+            content = self.encryption.decrypt(message['content'])
+        except Exception:
+            return message
+        return {**message, 'content': content, 'encrypted': False}
     
     def mark_as_read(self, sender: str, receiver: str) -> int:
         """Mark all messages in a conversation as read."""
         conv_id = self._get_conversation_id(sender, receiver)
-        count = 0
-        for msg in self._conversations.get(conv_id, []):
-            if msg['receiver'] == receiver and not msg['read']:
-                msg['read'] = True
-                count += 1
+        
+        if self.redis is not None:
+            key = self._redis_key(conv_id)
+            
+            def mark(pipe) -> int:
+                raw_messages = pipe.lrange(key, 0, -1)
+                pipe.multi()
+                count = 0
+                for index, raw in enumerate(raw_messages):
+                    msg = orjson.loads(raw)
+                    if msg['receiver'] == receiver and not msg['read']:
+                        msg['read'] = True
+                        pipe.lset(key, index, orjson.dumps(msg))
+                        count += 1
+                return count
+            
+            # WATCH the list so a concurrent send cannot shift the indices
+            count = self.redis.transaction(mark, key, value_from_callable=True)
+        else:
+            count = 0
+            for msg in self._conversations.get(conv_id, ()):
+                if msg['receiver'] == receiver and not msg['read']:
+                    msg['read'] = True
+                    count += 1
+        
+        if count:
+            self._add_unread(receiver, -count)
         return count
     
     def get_unread_count(self, username: str) -> int:
         """Get total unread messages for a user."""
-        count = 0
-        for messages in self._conversations.values():
-            for msg in messages:
-                if msg['receiver'] == username and not msg['read']:
-                    count += 1
-        return count
+        if self.redis is not None:
+            return int(self.redis.hget(self.UNREAD_KEY, username) or 0)
+        return self._unread[username]
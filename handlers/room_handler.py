@@ -1,11 +1,21 @@
 """
 Room Handler for managing room-related socket events
 """
-from typing import Optional
-from services.rooms import RoomService, RoomError
+from typing import Dict, Optional, Tuple
+import string
+from services.rooms import Room, RoomService, RoomError
 from services.logger import LoggerService
 
 
+# Prebuilt error responses. They are emitted as-is and must not be mutated.
+ERR_UNEXPECTED = {'success': False, 'error': 'An unexpected error occurred'}
+ERR_NO_ROOM_ID = {'success': False, 'error': 'Room ID is required'}
+ERR_ROOM_NOT_FOUND = {'success': False, 'error': 'Room not found'}
+
+# Lowercases ASCII room IDs and turns spaces into dashes in a single pass
+ROOM_ID_TABLE = str.maketrans(string.ascii_uppercase + ' ', string.ascii_lowercase + '-')
+
+
 class RoomHandler:
     """
     Handles room-related socket events and operations.
@@ -17,6 +27,8 @@ class RoomHandler:
     - Room message broadcasting
     """
     
+    __slots__ = ('room_service', 'logger', '_rooms_cache', '_info_cache', '_members_cache')
+    
     def __init__(self, room_service: RoomService, logger: LoggerService):
         """
         Initialize the room handler.
@@ -27,6 +39,14 @@ class RoomHandler:
         """
         self.room_service = room_service
         self.logger = logger
+        
+        # include_private -> (room service version, response)
+        self._rooms_cache: Dict[bool, Tuple[int, dict]] = {}
+        
+        # room_id -> (room, room version, response). The room is kept so a
+        # deleted and recreated room never matches an older entry.
+        self._info_cache: Dict[str, Tuple[Room, int, dict]] = {}
+        self._members_cache: Dict[str, Tuple[Room, int, dict]] = {}
     
     def create_room(self, room_data: dict, username: str) -> dict:
         """
@@ -40,14 +60,18 @@ class RoomHandler:
             Response dictionary with success status and room info
         """
         try:
-            room_id = room_data.get('room_id', '').lower().replace(' ', '-')
+            room_id = room_data.get('room_id', '')
+            if room_id.isascii():
+                room_id = room_id.translate(ROOM_ID_TABLE)
+            else:
+                room_id = room_id.lower().replace(' ', '-')
             name = room_data.get('name', room_id)
             is_private = room_data.get('is_private', False)
             description = room_data.get('description', '')
             max_users = room_data.get('max_users', 50)
             
             if not room_id:
-                return {'success': False, 'error': 'Room ID is required'}
+                return ERR_NO_ROOM_ID
             
             room = self.room_service.create_room(
                 room_id=room_id,
@@ -67,11 +91,11 @@ class RoomHandler:
             }
             
         except RoomError as e:
-            self.logger.warning(f"Room creation failed: {str(e)}")
+            self.logger.warning("Room creation failed: %s", e)
             return {'success': False, 'error': str(e)}
         except Exception as e:
-            self.logger.error(f"Unexpected error creating room: {str(e)}", exc_info=True)
-            return {'success': False, 'error': 'An unexpected error occurred'}
+            self.logger.error("Unexpected error creating room: %s", e, exc_info=True)
+            return ERR_UNEXPECTED
     
     def join_room(self, room_id: str, user_id: str, username: str) -> dict:
         """
@@ -101,11 +125,11 @@ class RoomHandler:
             }
             
         except RoomError as e:
-            self.logger.warning(f"Room join failed: {str(e)}")
+            self.logger.warning("Room join failed: %s", e)
             return {'success': False, 'error': str(e)}
         except Exception as e:
-            self.logger.error(f"Unexpected error joining room: {str(e)}", exc_info=True)
-            return {'success': False, 'error': 'An unexpected error occurred'}
+            self.logger.error("Unexpected error joining room: %s", e, exc_info=True)
+            return ERR_UNEXPECTED
     
     def leave_room(self, room_id: str, user_id: str, username: str) -> dict:
         """
@@ -132,8 +156,8 @@ class RoomHandler:
             }
             
         except Exception as e:
-            self.logger.error(f"Error leaving room: {str(e)}", exc_info=True)
-            return {'success': False, 'error': 'An unexpected error occurred'}
+            self.logger.error("Error leaving room: %s", e, exc_info=True)
+            return ERR_UNEXPECTED
     
     def delete_room(self, room_id: str, username: str) -> dict:
         """
@@ -150,6 +174,8 @@ class RoomHandler:
             success = self.room_service.delete_room(room_id, username)
             
             if success:
+                self._info_cache.pop(room_id, None)
+                self._members_cache.pop(room_id, None)
                 self.logger.log_room_event(room_id, username, 'delete')
             
             return {
@@ -159,11 +185,11 @@ class RoomHandler:
             }
             
         except RoomError as e:
-            self.logger.warning(f"Room deletion failed: {str(e)}")
+            self.logger.warning("Room deletion failed: %s", e)
             return {'success': False, 'error': str(e)}
         except Exception as e:
-            self.logger.error(f"Error deleting room: {str(e)}", exc_info=True)
-            return {'success': False, 'error': 'An unexpected error occurred'}
+            self.logger.error("Error deleting room: %s", e, exc_info=True)
+            return ERR_UNEXPECTED
     
     def get_rooms(self, include_private: bool = False) -> dict:
         """
@@ -173,18 +199,26 @@ class RoomHandler:
             include_private: Whether to include private rooms
             
         Returns:
-            Response dictionary with room list
+            Response dictionary with room list. It is reused until a room
+            changes and must not be mutated.
         """
         try:
+            version = self.room_service.version
+            cached = self._rooms_cache.get(include_private)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            
             rooms = self.room_service.get_all_rooms(include_private)
-            return {
+            response = {
                 'success': True,
                 'rooms': rooms,
                 'count': len(rooms)
             }
+            self._rooms_cache[include_private] = (version, response)
+            return response
         except Exception as e:
-            self.logger.error(f"Error getting rooms: {str(e)}", exc_info=True)
-            return {'success': False, 'error': 'An unexpected error occurred'}
+            self.logger.error("Error getting rooms: %s", e, exc_info=True)
+            return ERR_UNEXPECTED
     
     def get_room_info(self, room_id: str) -> dict:
         """
@@ -194,22 +228,29 @@ class RoomHandler:
             room_id: ID of the room
             
         Returns:
-            Response dictionary with room info
+            Response dictionary with room info. It is reused until the room
+            changes and must not be mutated.
         """
         try:
             room = self.room_service.get_room(room_id)
             
             if room:
-                return {
+                cached = self._info_cache.get(room_id)
+                if cached is not None and cached[0] is room and cached[1] == room.version:
+                    return cached[2]
+                
+                response = {
                     'success': True,
                     'room': room.to_dict()
                 }
+                self._info_cache[room_id] = (room, room.version, response)
+                return response
             else:
-                return {'success': False, 'error': 'Room not found'}
+                return ERR_ROOM_NOT_FOUND
                 
         except Exception as e:
-            self.logger.error(f"Error getting room info: {str(e)}", exc_info=True)
-            return {'success': False, 'error': 'An unexpected error occurred'}
+            self.logger.error("Error getting room info: %s", e, exc_info=True)
+            return ERR_UNEXPECTED
     
     def get_room_members(self, room_id: str) -> dict:
         """
@@ -219,19 +260,29 @@ class RoomHandler:
             room_id: ID of the room
             
         Returns:
-            Response dictionary with member list
+            Response dictionary with member list. It is reused until the room
+            changes and must not be mutated.
         """
         try:
+            room = self.room_service.get_room(room_id)
+            if room is not None:
+                cached = self._members_cache.get(room_id)
+                if cached is not None and cached[0] is room and cached[1] == room.version:
+                    return cached[2]
+            
             members = self.room_service.get_room_members(room_id)
-            return {
+            response = {
                 'success': True,
                 'room_id': room_id,
                 'members': members,
                 'count': len(members)
             }
+            if room is not None:
+                self._members_cache[room_id] = (room, room.version, response)
+            return response
         except Exception as e:
-            self.logger.error(f"Error getting room members: {str(e)}", exc_info=True)
-            return {'success': False, 'error': 'An unexpected error occurred'}
+            self.logger.error("Error getting room members: %s", e, exc_info=True)
+            return ERR_UNEXPECTED
     
     def handle_disconnect(self, user_id: str, username: str) -> list:
         """
@@ -247,11 +298,11 @@ class RoomHandler:
         try:
             left_rooms = self.room_service.leave_all_rooms(user_id, username)
             
-            for room_id in left_rooms:
-                self.logger.log_room_event(room_id, username, 'disconnect')
+            if left_rooms:
+                self.logger.log_room_events(left_rooms, username, 'disconnect')
             
             return left_rooms
             
         except Exception as e:
-            self.logger.error(f"Error handling disconnect: {str(e)}", exc_info=True)
+            self.logger.error("Error handling disconnect: %s", e, exc_info=True)
             return []
@@ -2,18 +2,18 @@
 User Handler for managing user-related operations
 """
 from typing import Dict, Optional, List
-from datetime import datetime
 from dataclasses import dataclass, field
 import re
+import time
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
-    """Represents a connected user."""
+    """Represents a connected user. connected_at is a time.monotonic() reading."""
     socket_id: str
     username: str
     display_name: str
-    connected_at: datetime = field(default_factory=datetime.now)
+    connected_at: float = field(default_factory=time.monotonic)
     status: str = 'online'
     current_room: str = 'general'
     ip_address: str = 'unknown'
@@ -29,47 +29,133 @@ class User:
 
 
 class UserHandler:
-    """Handles user management and operations."""
+    """
+    Handles user management and operations.
+    
+    Users are stored column-wise, one list per field, with a socket ID ->
+    row index. User objects are only built when a caller asks for one.
+    """
+    
+    __slots__ = (
+        'logger', '_sids', '_usernames', '_display_names', '_connected_at', '_statuses',
+        '_current_rooms', '_ip_addresses', '_columns', '_sid_to_idx', '_name_to_sid',
+        '_user_list', '_user_counter'
+    )
     
     def __init__(self, logger=None):
         self.logger = logger
-        self._users: Dict[str, User] = {}
-        self._usernames: Dict[str, str] = {}
+        
+        # Column storage, one row per connected user
+        self._sids: List[str] = []
+        self._usernames: List[str] = []
+        self._display_names: List[str] = []
+        self._connected_at: List[float] = []
+        self._statuses: List[str] = []
+        self._current_rooms: List[str] = []
+        self._ip_addresses: List[str] = []
+        self._columns = (
+            self._sids, self._usernames, self._display_names, self._connected_at,
+            self._statuses, self._current_rooms, self._ip_addresses
+        )
+        
+        self._sid_to_idx: Dict[str, int] = {}
+        self._name_to_sid: Optional[Dict[str, str]] = None  # display_name -> socket_id, built on demand
+        self._user_list: Optional[List[str]] = None  # Cached get_user_list snapshot
         self._user_counter = 1
     
+    def _user_at(self, idx: int) -> User:
+        """Build a User from the row at the given index."""
+        return User(
+            socket_id=self._sids[idx],
+            username=self._usernames[idx],
+            display_name=self._display_names[idx],
+            connected_at=self._connected_at[idx],
+            status=self._statuses[idx],
+            current_room=self._current_rooms[idx],
+            ip_address=self._ip_addresses[idx]
+        )
+    
     def register_user(self, socket_id: str, username: str, ip: str = 'unknown') -> User:
         display_name = f"user{self._user_counter} ({username})"
         self._user_counter += 1
         
         user = User(socket_id=socket_id, username=username, display_name=display_name, ip_address=ip)
-        self._users[socket_id] = user
-        self._usernames[display_name] = socket_id
+        row = (user.socket_id, user.username, user.display_name, user.connected_at,
+               user.status, user.current_room, user.ip_address)
+        
+        idx = self._sid_to_idx.get(socket_id)
+        if idx is None:
+            self._sid_to_idx[socket_id] = len(self._sids)
+            for column, value in zip(self._columns, row):
+                column.append(value)
+        else:
+            # Re-registration replaces the row
+            for column, value in zip(self._columns, row):
+                column[idx] = value
+        
+        self._name_to_sid = None
+        self._user_list = None
         
         if self.logger:
             self.logger.log_connection(socket_id, display_name, 'register', ip)
         return user
     
     def unregister_user(self, socket_id: str) -> Optional[User]:
-        if socket_id not in self._users:
+        """
+        Remove a user, moving the last row into the freed slot. This reorders
+        get_user_list: the most recently stored user takes the removed
+        user's position.
+        """
+        idx = self._sid_to_idx.pop(socket_id, None)
+        if idx is None:
             return None
-        user = self._users.pop(socket_id)
-        self._usernames.pop(user.display_name, None)
+        user = self._user_at(idx)
+        
+        # Swap the last row into the freed slot, then drop the last row
+        last = len(self._sids) - 1
+        if idx != last:
+            for column in self._columns:
+                column[idx] = column[last]
+            self._sid_to_idx[self._sids[idx]] = idx
+        for column in self._columns:
+            column.pop()
+        
+        self._name_to_sid = None
+        self._user_list = None
+        
         if self.logger:
             self.logger.log_connection(socket_id, user.display_name, 'disconnect')
         return user
     
     def get_user(self, socket_id: str) -> Optional[User]:
-        return self._users.get(socket_id)
+        """
+        Return a User built from the stored row. It is a detached snapshot:
+        changes made to it are not written back to the handler.
+        """
+        idx = self._sid_to_idx.get(socket_id)
+        return None if idx is None else self._user_at(idx)
     
     def get_socket_id_by_username(self, username: str) -> Optional[str]:
-        return self._usernames.get(username)
+        # The reverse index is rebuilt on the first lookup after the user set
+        # changes, so connects and disconnects skip maintaining it
+        if self._name_to_sid is None:
+            self._name_to_sid = dict(zip(self._display_names, self._sids))
+        return self._name_to_sid.get(username)
     
     def get_username(self, socket_id: str) -> Optional[str]:
-        user = self._users.get(socket_id)
-        return user.display_name if user else None
+        idx = self._sid_to_idx.get(socket_id)
+        return None if idx is None else self._display_names[idx]
     
     def get_user_list(self) -> List[str]:
-        return [user.display_name for user in self._users.values()]
+        """
+        Return the display names of connected users. The list is cached and
+        shared until the user set changes, so callers must not modify it.
+        It is a list rather than a tuple because python-socketio expands a
+        tuple payload into separate event arguments.
+        """
+        if self._user_list is None:
+            self._user_list = list(self._display_names)
+        return self._user_list
     
     def user_count(self) -> int:
-        return len(self._users)
+        return len(self._sids)
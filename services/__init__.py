@@ -4,5 +4,6 @@ Services package for QuikTalk Chat Application
 from .encryption import EncryptionService
 from .logger import LoggerService
 from .rooms import RoomService
+from .serializer import JSONSerializer
 
-__all__ = ['EncryptionService', 'LoggerService', 'RoomService']
+__all__ = ['EncryptionService', 'LoggerService', 'RoomService', 'JSONSerializer']
@@ -1,16 +1,28 @@
 """
 Encryption Service for secure message handling
-Uses Fernet symmetric encryption from the cryptography library
+Uses AES-256-GCM authenticated encryption from the cryptography library
 """
-from cryptography.fernet import Fernet, InvalidToken
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from typing import Dict, List
 import base64
+import binascii
+import functools
 import hashlib
 import os
+import sys
+
+
+NONCE_SIZE = 12  # 96-bit nonce recommended for GCM
+ROOM_KEY_SIZE = 32  # 256-bit AES keys
+ROOM_KEY_POOL_SIZE = 128  # Room keys generated per pool refill
 
 
 class EncryptionService:
     """
-    Handles message encryption and decryption using Fernet symmetric encryption.
+    Handles message encryption and decryption using AES-256-GCM.
+    
+    Tokens are standard base64(nonce || ciphertext || tag) with a random 12-byte nonce.
     
     Features:
     - Generate secure encryption keys
@@ -28,34 +40,82 @@ class EncryptionService:
                        a new key will be generated.
         """
         if master_key:
-            # Derive a Fernet-compatible key from the master key
+            # Derive a 256-bit key from the master key
             self._key = self._derive_key(master_key)
         else:
-            self._key = Fernet.generate_key()
+            self._key = self.generate_key()
         
-        self._cipher = Fernet(self._key)
-        self._room_ciphers = {}  # Room-specific encryption
+        self._cipher = AESGCM(base64.urlsafe_b64decode(self._key))
+        self._room_ciphers: Dict[str, AESGCM] = {}  # Room-specific encryption
+        self._room_keys: Dict[str, str] = {}  # room_id -> base64 room key
+        self._room_key_pool: List[bytes] = []  # Pre-generated room keys
     
     @staticmethod
     def generate_key() -> bytes:
-        """Generate a new Fernet encryption key."""
-        return Fernet.generate_key()
+        """Generate a new base64-encoded 256-bit encryption key."""
+        return base64.urlsafe_b64encode(AESGCM.generate_key(bit_length=256))
     
     @staticmethod
+    @functools.lru_cache(maxsize=32)
     def _derive_key(password: str) -> bytes:
         """
-        Derive a Fernet-compatible key from a password string.
+        Derive an AES-256 key from a password string.
         
         Args:
             password: The password to derive the key from
             
         Returns:
-            A base64-encoded 32-byte key suitable for Fernet
+            A base64-encoded 32-byte key
         """
-        # Use SHA-256 to get a 32-byte key, then base64 encode it
+        # SHA-256 gives a 32-byte key; lru_cache skips re-hashing known passwords
         key = hashlib.sha256(password.encode()).digest()
         return base64.urlsafe_b64encode(key)
     
+    @staticmethod
+    def _seal(cipher: AESGCM, data: bytes) -> bytes:
+        """Encrypt data with a fresh nonce and encode the token."""
+        nonce = os.urandom(NONCE_SIZE)
+        encrypted = cipher.encrypt(nonce, data, None)
+        return binascii.b2a_base64(nonce + encrypted, newline=False)
+    
+    @staticmethod
+    def _open(cipher: AESGCM, token: bytes) -> bytes:
+        """Decode a token (bytes or ASCII str) and decrypt it, verifying its tag."""
+        raw = binascii.a2b_base64(token)
+        return cipher.decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], None)
+    
+    def encrypt_bytes(self, message: bytes) -> bytes:
+        """
+        Encrypt raw bytes.
+        
+        Args:
+            message: The plaintext bytes to encrypt
+            
+        Returns:
+            The encrypted token as base64 bytes
+        """
+        try:
+            return self._seal(self._cipher, message)
+        except Exception as e:
+            raise EncryptionError(f"Failed to encrypt message: {str(e)}")
+    
+    def decrypt_bytes(self, token: bytes) -> bytes:
+        """
+        Decrypt a token to raw bytes.
+        
+        Args:
+            token: The encrypted token as base64 bytes
+            
+        Returns:
+            The decrypted plaintext bytes
+        """
+        try:
+            return self._open(self._cipher, token)
+        except InvalidTag:
+            raise EncryptionError("Invalid token - message may be corrupted or tampered with")
+        except Exception as e:
+            raise EncryptionError(f"Failed to decrypt message: {str(e)}")
+    
     def encrypt(self, message: str) -> str:
         """
         Encrypt a message.
@@ -66,11 +126,7 @@ class EncryptionService:
         Returns:
             The encrypted message as a base64 string
         """
-        try:
-            encrypted = self._cipher.encrypt(message.encode('utf-8'))
-            return encrypted.decode('utf-8')
-        except Exception as e:
-            raise EncryptionError(f"Failed to encrypt message: {str(e)}")
+        return self.encrypt_bytes(message.encode('utf-8')).decode('ascii')
     
     def decrypt(self, encrypted_message: str) -> str:
         """
@@ -82,14 +138,23 @@ class EncryptionService:
         Returns:
             The decrypted plaintext message
         """
+        plaintext = self.decrypt_bytes(encrypted_message)
         try:
-            decrypted = self._cipher.decrypt(encrypted_message.encode('utf-8'))
-            return decrypted.decode('utf-8')
-        except InvalidToken:
-            raise EncryptionError("Invalid token - message may be corrupted or tampered with")
-        except Exception as e:
+            return plaintext.decode('utf-8')
+        except UnicodeDecodeError as e:
             raise EncryptionError(f"Failed to decrypt message: {str(e)}")
     
+    def _next_room_key(self) -> bytes:
+        """Take a pre-generated room key, refilling the pool in bulk when empty."""
+        if not self._room_key_pool:
+            # One entropy draw for the whole pool, sliced into keys
+            entropy = os.urandom(ROOM_KEY_SIZE * ROOM_KEY_POOL_SIZE)
+            self._room_key_pool = [
+                base64.urlsafe_b64encode(entropy[i:i + ROOM_KEY_SIZE])
+                for i in range(0, len(entropy), ROOM_KEY_SIZE)
+            ]
+        return self._room_key_pool.pop()
+    
     def create_room_key(self, room_id: str) -> str:
         """
         Create a unique encryption key for a chat room.
@@ -98,11 +163,14 @@ class EncryptionService:
             room_id: The unique identifier of the room
             
         Returns:
-            The room's encryption key as a string
+            The room's encryption key as a string. A room that already has
+            a key keeps it.
         """
-        room_key = Fernet.generate_key()
-        self._room_ciphers[room_id] = Fernet(room_key)
-        return room_key.decode('utf-8')
+        room_key = self._room_keys.get(room_id)
+        if room_key is None:
+            room_key = self._next_room_key().decode('ascii')
+            self.set_room_key(room_id, room_key)
+        return room_key
     
     def set_room_key(self, room_id: str, key: str) -> None:
         """
@@ -112,7 +180,10 @@ class EncryptionService:
             room_id: The unique identifier of the room
             key: The encryption key as a string
         """
-        self._room_ciphers[room_id] = Fernet(key.encode('utf-8'))
+        # Interned so both maps share a single key string per room
+        room_id = sys.intern(room_id)
+        self._room_ciphers[room_id] = AESGCM(base64.urlsafe_b64decode(key))
+        self._room_keys[room_id] = key
     
     def encrypt_for_room(self, room_id: str, message: str) -> str:
         """
@@ -125,17 +196,34 @@ class EncryptionService:
         Returns:
             The encrypted message as a base64 string
         """
-        if room_id not in self._room_ciphers:
+        cipher = self._room_ciphers.get(room_id)
+        if cipher is None:
             # Use default cipher if no room-specific key exists
             return self.encrypt(message)
         
         try:
-            cipher = self._room_ciphers[room_id]
-            encrypted = cipher.encrypt(message.encode('utf-8'))
-            return encrypted.decode('utf-8')
+            return self._seal(cipher, message.encode('utf-8')).decode('ascii')
         except Exception as e:
             raise EncryptionError(f"Failed to encrypt message for room {room_id}: {str(e)}")
     
+    def encrypt_batch_for_room(self, room_id: str, messages: List[str]) -> List[str]:
+        """
+        Encrypt several messages for a room, resolving its cipher once.
+        
+        Args:
+            room_id: The unique identifier of the room
+            messages: The plaintext messages to encrypt
+            
+        Returns:
+            The encrypted messages as base64 strings, in the same order
+        """
+        cipher = self._room_ciphers.get(room_id, self._cipher)
+        
+        try:
+            return [self._seal(cipher, message.encode('utf-8')).decode('ascii') for message in messages]
+        except Exception as e:
+            raise EncryptionError(f"Failed to encrypt messages for room {room_id}: {str(e)}")
+    
     def decrypt_for_room(self, room_id: str, encrypted_message: str) -> str:
         """
         Decrypt a message using room-specific encryption.
@@ -147,15 +235,14 @@ class EncryptionService:
         Returns:
             The decrypted plaintext message
         """
-        if room_id not in self._room_ciphers:
+        cipher = self._room_ciphers.get(room_id)
+        if cipher is None:
             # Use default cipher if no room-specific key exists
             return self.decrypt(encrypted_message)
         
         try:
-            cipher = self._room_ciphers[room_id]
-            decrypted = cipher.decrypt(encrypted_message.encode('utf-8'))
-            return decrypted.decode('utf-8')
-        except InvalidToken:
+            return self._open(cipher, encrypted_message).decode('utf-8')
+        except InvalidTag:
             raise EncryptionError("Invalid token - message may be corrupted or tampered with")
         except Exception as e:
             raise EncryptionError(f"Failed to decrypt message for room {room_id}: {str(e)}")
@@ -170,10 +257,8 @@ class EncryptionService:
         Returns:
             True if the key was removed, False if it didn't exist
         """
-        if room_id in self._room_ciphers:
-            del self._room_ciphers[room_id]
-            return True
-        return False
+        self._room_keys.pop(room_id, None)
+        return self._room_ciphers.pop(room_id, None) is not None
     
     def get_public_key(self) -> str:
         """
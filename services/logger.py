@@ -2,12 +2,87 @@
 Logging Service for QuikTalk Chat Application
 Provides comprehensive logging with file rotation and multiple log levels
 """
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
-from functools import wraps
-import traceback
+import queue
+import threading
+import time
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
+from functools import lru_cache, wraps
+from typing import Iterable, Optional
+
+import orjson
+
+LOG_FLUSH_INTERVAL = 1.0  # Seconds between flushes of buffered log records
+BYTES_TO_MB = 1 / (1024 * 1024)
+
+# Event names come from a small fixed set, so their upper-cased forms are memoized
+_upper = lru_cache(maxsize=64)(str.upper)
+
+
+def _noop(*args, **kwargs):
+    """Stand-in for logging methods whose records the configured level drops."""
+
+
+# None of the formatters use thread or process fields, so skip looking them up per record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that renders the date/time part of asctime once per second."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (whole second, formatted time), replaced as one tuple so readers never see a mix
+        self._time_cache = (None, '')
+    
+    def formatTime(self, record: logging.LogRecord, datefmt: str = None) -> str:
+        second = int(record.created)
+        cached_second, formatted = self._time_cache
+        if second != cached_second:
+            formatted = time.strftime(datefmt or self.default_time_format, self.converter(second))
+            self._time_cache = (second, formatted)
+        if datefmt:
+            return formatted
+        return self.default_msec_format % (formatted, record.msecs)
+
+
+class EventFormatter(CachedTimeFormatter):
+    """Formats a record as one NDJSON line, tagged with its event type."""
+    
+    EVENT_TYPES = {
+        'quiktalk.messages': 'message',
+        'quiktalk.connections': 'connection',
+        'quiktalk.rooms': 'room'
+    }
+    
+    def format(self, record: logging.LogRecord) -> str:
+        # Records arrive through the QueueHandler, whose prepare() has already
+        # merged any traceback into msg and cleared exc_info
+        message = record.getMessage()
+        
+        if record.levelno >= logging.ERROR:
+            event_type = 'error'
+        else:
+            event_type = self.EVENT_TYPES.get(record.name, 'app')
+        
+        return orjson.dumps({
+            'ts': self.formatTime(record),
+            'type': event_type,
+            'level': record.levelname,
+            'msg': message
+        }).decode('utf-8')
+
+
+# Shared by all handlers; the time cache is swapped atomically as one tuple
+DETAILED_FORMATTER = CachedTimeFormatter(
+    '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+)
+SIMPLE_FORMATTER = CachedTimeFormatter('%(asctime)s - %(levelname)s - %(message)s')
+EVENT_FORMATTER = EventFormatter()
 
 
 class LoggerService:
@@ -21,16 +96,10 @@ class LoggerService:
     - Structured logging with timestamps
     - Performance logging decorator
     - Event-specific loggers
-    """
-    
-    _instance = None
-    _initialized = False
+    - File and console output written from a background listener thread
     
-    def __new__(cls, *args, **kwargs):
-        """Singleton pattern to ensure one logger instance."""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    Use get_logger() to share one instance across the application.
+    """
     
     def __init__(self, log_dir: str = 'logs', log_file: str = 'quiktalk.log',
                  log_level: str = 'INFO', max_bytes: int = 10*1024*1024,
@@ -45,42 +114,33 @@ class LoggerService:
             max_bytes: Maximum size of log file before rotation
             backup_count: Number of backup files to keep
         """
-        if LoggerService._initialized:
-            return
-            
         self.log_dir = log_dir
         self.log_file = log_file
         self.log_level = getattr(logging, log_level.upper(), logging.INFO)
         self.max_bytes = max_bytes
         self.backup_count = backup_count
         
+        # The 'quiktalk' logger tree gets one queue and listener per process
+        self.logger = logging.getLogger('quiktalk')
+        if any(isinstance(handler, QueueHandler) for handler in self.logger.handlers):
+            raise RuntimeError("The 'quiktalk' logger is already configured; use get_logger()")
+        
         # Create logs directory if it doesn't exist
-        if not os.path.exists(self.log_dir):
-            os.makedirs(self.log_dir)
+        os.makedirs(self.log_dir, exist_ok=True)
         
-        # Setup loggers
+        # Setup loggers. Handlers are collected here and driven by the queue listener.
+        self._handlers = []
+        self._buffers = []  # MemoryHandlers flushed by the background flush thread
         self._setup_main_logger()
         self._setup_event_loggers()
-        
-        LoggerService._initialized = True
+        self._start_queue_listener()
+        self._start_flush_thread()
+        self._disable_filtered_methods()
     
     def _setup_main_logger(self):
         """Setup the main application logger."""
-        self.logger = logging.getLogger('quiktalk')
         self.logger.setLevel(self.log_level)
         
-        # Prevent duplicate handlers
-        if self.logger.handlers:
-            return
-        
-        # Create formatters
-        detailed_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-        )
-        simple_formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s'
-        )
-        
         # File handler with rotation
         file_path = os.path.join(self.log_dir, self.log_file)
         file_handler = RotatingFileHandler(
@@ -88,73 +148,119 @@ class LoggerService:
             maxBytes=self.max_bytes,
             backupCount=self.backup_count
         )
-        file_handler.setLevel(self.log_level)
-        file_handler.setFormatter(detailed_formatter)
+        file_handler.setFormatter(DETAILED_FORMATTER)
+        
+        # Buffer file writes; ERROR records and the flush thread write them out
+        file_buffer = MemoryHandler(capacity=1024, flushLevel=logging.ERROR, target=file_handler)
+        file_buffer.setLevel(self.log_level)
+        self._buffers.append(file_buffer)
         
         # Console handler
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(simple_formatter)
+        console_handler.setFormatter(SIMPLE_FORMATTER)
         
-        # Add handlers
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        self._handlers.extend((file_buffer, console_handler))
     
     def _setup_event_loggers(self):
-        """Setup specialized loggers for different event types."""
-        # Message logger
-        self.message_logger = logging.getLogger('quiktalk.messages')
-        msg_file = os.path.join(self.log_dir, 'messages.log')
-        msg_handler = RotatingFileHandler(msg_file, maxBytes=self.max_bytes, backupCount=self.backup_count)
-        msg_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.message_logger.addHandler(msg_handler)
+        """
+        Setup specialized loggers for different event types.
         
-        # Connection logger
+        Event records propagate to the main logger, so one record reaches
+        quiktalk.log, the console and events.ndjson. The events file takes
+        event records and all ERROR+ records, one JSON object per line
+        tagged with the event type.
+        """
+        self.message_logger = logging.getLogger('quiktalk.messages')
         self.connection_logger = logging.getLogger('quiktalk.connections')
-        conn_file = os.path.join(self.log_dir, 'connections.log')
-        conn_handler = RotatingFileHandler(conn_file, maxBytes=self.max_bytes, backupCount=self.backup_count)
-        conn_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.connection_logger.addHandler(conn_handler)
-        
-        # Room logger
         self.room_logger = logging.getLogger('quiktalk.rooms')
-        room_file = os.path.join(self.log_dir, 'rooms.log')
-        room_handler = RotatingFileHandler(room_file, maxBytes=self.max_bytes, backupCount=self.backup_count)
-        room_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.room_logger.addHandler(room_handler)
-        
-        # Error logger
-        self.error_logger = logging.getLogger('quiktalk.errors')
-        error_file = os.path.join(self.log_dir, 'errors.log')
-        error_handler = RotatingFileHandler(error_file, maxBytes=self.max_bytes, backupCount=self.backup_count)
-        error_handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d]\n%(message)s\n'
-        ))
-        self.error_logger.addHandler(error_handler)
-    
-    # Main logging methods
-    def debug(self, message: str):
+        
+        events_file = os.path.join(self.log_dir, 'events.ndjson')
+        events_handler = RotatingFileHandler(events_file, maxBytes=self.max_bytes, backupCount=self.backup_count)
+        events_handler.setFormatter(EVENT_FORMATTER)
+        
+        # Events come in bursts (one per room on disconnect), so buffer them;
+        # an ERROR record flushes the buffer straight away
+        self.event_log_buffer = MemoryHandler(capacity=256, flushLevel=logging.ERROR, target=events_handler)
+        self.event_log_buffer.addFilter(
+            lambda record: record.name in EventFormatter.EVENT_TYPES or record.levelno >= logging.ERROR
+        )
+        self._handlers.append(self.event_log_buffer)
+        self._buffers.append(self.event_log_buffer)
+    
+    def _start_queue_listener(self):
+        """
+        Route all records through a queue so file and console I/O happens on
+        a background thread instead of the socket event handlers.
+        """
+        # queue.Queue rather than SimpleQueue: its locks are green under eventlet
+        log_queue = queue.Queue(-1)
+        self.logger.addHandler(QueueHandler(log_queue))
+        self._listener = QueueListener(log_queue, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.shutdown)
+    
+    def _disable_filtered_methods(self):
+        """
+        Replace methods that can only produce records below the configured
+        level with no-ops, so disabled calls cost a single function call.
+        The level is fixed for the life of the service.
+        """
+        if self.log_level > logging.DEBUG:
+            self.debug = _noop
+        if self.log_level > logging.INFO:
+            self.info = _noop
+            # The event methods all log at INFO
+            self.log_message = self.log_connection = _noop
+            self.log_room_event = self.log_room_events = _noop
+            self.log_private_message = _noop
+    
+    def _start_flush_thread(self):
+        """Flush buffered log records every LOG_FLUSH_INTERVAL seconds."""
+        self._stop_flushing = threading.Event()
+        
+        def flush_loop():
+            while not self._stop_flushing.wait(LOG_FLUSH_INTERVAL):
+                self.flush()
+        
+        threading.Thread(target=flush_loop, name='quiktalk-log-flush', daemon=True).start()
+    
+    def flush(self):
+        """Write out all buffered log records."""
+        for buffer in self._buffers:
+            buffer.flush()
+    
+    def shutdown(self):
+        """Drain the log queue and write out buffered records. Safe to call more than once."""
+        if self._listener is None:
+            return
+        atexit.unregister(self.shutdown)
+        self._stop_flushing.set()
+        self._listener.stop()
+        self._listener = None
+        self.flush()
+    
+    # Main logging methods. Extra args are %-formatted by logging only if
+    # the record is actually emitted.
+    def debug(self, message: str, *args):
         """Log a debug message."""
-        self.logger.debug(message)
+        self.logger.debug(message, *args)
     
-    def info(self, message: str):
+    def info(self, message: str, *args):
         """Log an info message."""
-        self.logger.info(message)
+        self.logger.info(message, *args)
     
-    def warning(self, message: str):
+    def warning(self, message: str, *args):
         """Log a warning message."""
-        self.logger.warning(message)
+        self.logger.warning(message, *args)
     
-    def error(self, message: str, exc_info: bool = False):
+    def error(self, message: str, *args, exc_info: bool = False):
         """Log an error message with optional exception info."""
-        self.logger.error(message, exc_info=exc_info)
-        if exc_info:
-            self.error_logger.error(f"{message}\n{traceback.format_exc()}")
+        self.logger.error(message, *args, exc_info=exc_info)
     
-    def critical(self, message: str, exc_info: bool = True):
+    def critical(self, message: str, *args, exc_info: bool = True):
         """Log a critical message with exception info."""
-        self.logger.critical(message, exc_info=exc_info)
-        self.error_logger.critical(f"{message}\n{traceback.format_exc()}")
+        self.logger.critical(message, *args, exc_info=exc_info)
     
     # Event-specific logging methods
     def log_message(self, sender: str, receiver: str, room: str, message_type: str = 'text'):
@@ -167,9 +273,9 @@ class LoggerService:
             room: Room name or 'private' for DMs
             message_type: Type of message (text, image, file, etc.)
         """
-        log_entry = f"[{message_type.upper()}] {sender} -> {receiver} in {room}"
-        self.message_logger.info(log_entry)
-        self.debug(log_entry)
+        template = "[%s] %s -> %s in %s"
+        message_type = _upper(message_type)
+        self.message_logger.info(template, message_type, sender, receiver, room)
     
     def log_connection(self, user_id: str, username: str, event: str, ip: str = 'unknown'):
         """
@@ -181,9 +287,9 @@ class LoggerService:
             event: Event type (connect, disconnect, reconnect)
             ip: IP address of the user
         """
-        log_entry = f"[{event.upper()}] {username} (ID: {user_id}) from {ip}"
-        self.connection_logger.info(log_entry)
-        self.info(log_entry)
+        template = "[%s] %s (ID: %s) from %s"
+        event = _upper(event)
+        self.connection_logger.info(template, event, username, user_id, ip)
     
     def log_room_event(self, room: str, user: str, event: str):
         """
@@ -194,9 +300,25 @@ class LoggerService:
             user: Username
             event: Event type (create, join, leave, delete)
         """
-        log_entry = f"[{event.upper()}] {user} - Room: {room}"
-        self.room_logger.info(log_entry)
-        self.info(log_entry)
+        template = "[%s] %s - Room: %s"
+        event = _upper(event)
+        self.room_logger.info(template, event, user, room)
+    
+    def log_room_events(self, rooms: Iterable[str], user: str, event: str):
+        """
+        Log one room event covering several rooms.
+        
+        Args:
+            rooms: Room names
+            user: Username
+            event: Event type (e.g. disconnect)
+        """
+        # Skip joining the room list when INFO records would be dropped anyway
+        if not self.room_logger.isEnabledFor(logging.INFO):
+            return
+        template = "[%s] %s - Rooms: %s"
+        event, rooms = _upper(event), ', '.join(rooms)
+        self.room_logger.info(template, event, user, rooms)
     
     def log_private_message(self, sender: str, receiver: str):
         """
@@ -206,9 +328,8 @@ class LoggerService:
             sender: Sender username
             receiver: Receiver username
         """
-        log_entry = f"[PRIVATE] {sender} -> {receiver}"
-        self.message_logger.info(log_entry)
-        self.debug(log_entry)
+        template = "[PRIVATE] %s -> %s"
+        self.message_logger.info(template, sender, receiver)
     
     # Utility methods
     def log_performance(self, func):
@@ -222,11 +343,13 @@ class LoggerService:
         """
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = datetime.now()
+            # Timings are only ever logged at DEBUG, so don't measure otherwise
+            if not self.logger.isEnabledFor(logging.DEBUG):
+                return func(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
             result = func(*args, **kwargs)
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds() * 1000
-            self.debug(f"Function {func.__name__} took {duration:.2f}ms")
+            duration = (time.perf_counter_ns() - start_ns) / 1e6
+            self.logger.debug("Function %s took %.2fms", func.__name__, duration)
             return result
         return wrapper
     
@@ -238,17 +361,30 @@ class LoggerService:
             Dictionary with log file sizes and counts
         """
         stats = {}
-        for filename in os.listdir(self.log_dir):
-            filepath = os.path.join(self.log_dir, filename)
-            if os.path.isfile(filepath):
-                stats[filename] = {
-                    'size_bytes': os.path.getsize(filepath),
-                    'size_mb': round(os.path.getsize(filepath) / (1024 * 1024), 2)
-                }
+        with os.scandir(self.log_dir) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    size = entry.stat().st_size
+                    stats[entry.name] = {
+                        'size_bytes': size,
+                        'size_mb': round(size * BYTES_TO_MB, 2)
+                    }
         return stats
 
 
 # Create a global logger instance
+_service: Optional[LoggerService] = None
+_service_lock = threading.Lock()
+
+
 def get_logger(**kwargs) -> LoggerService:
-    """Get the global logger instance."""
-    return LoggerService(**kwargs)
+    """
+    Get the global logger instance. The first call creates it from kwargs;
+    later calls return the same instance and their kwargs are ignored.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = LoggerService(**kwargs)
+    return _service
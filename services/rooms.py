@@ -2,12 +2,14 @@
 Room Service for managing chat rooms
 Handles room creation, user management, and room-specific features
 """
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional, Set
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Set
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class Room:
     """Represents a chat room."""
     id: str
@@ -19,22 +21,56 @@ class Room:
     description: str = ""
     members: Set[str] = field(default_factory=set)
     admins: Set[str] = field(default_factory=set)
-    message_history: List[dict] = field(default_factory=list)
+    message_history: Deque[dict] = field(default_factory=deque)
+    version: int = field(default=0, init=False, compare=False)
+    _dict_cache: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+    _created_at_iso: str = field(default='', init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # created_at never changes, so format it once
+        self._created_at_iso = self.created_at.isoformat()
+    
+    def touch(self) -> None:
+        """Record a change to the room, invalidating its cached dictionary."""
+        self.version += 1
+        self._dict_cache = None
+    
+    def add_member(self, username: str) -> None:
+        """Add a member to the room."""
+        self.members.add(username)
+        self.touch()
+    
+    def remove_member(self, username: str) -> None:
+        """Remove a member from the room if present."""
+        self.members.discard(username)
+        self.touch()
+    
+    def add_admin(self, username: str) -> None:
+        """Grant admin rights on the room."""
+        self.admins.add(username)
+        self.touch()
     
     def to_dict(self) -> dict:
-        """Convert room to dictionary for JSON serialization."""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'created_by': self.created_by,
-            'created_at': self.created_at.isoformat(),
-            'is_private': self.is_private,
-            'max_users': self.max_users,
-            'description': self.description,
-            'member_count': len(self.members),
-            'members': list(self.members),
-            'admins': list(self.admins)
-        }
+        """
+        Convert room to dictionary for JSON serialization.
+        
+        The dictionary is cached until the room changes and is shared
+        between callers, so it must not be mutated.
+        """
+        if self._dict_cache is None:
+            self._dict_cache = {
+                'id': self.id,
+                'name': self.name,
+                'created_by': self.created_by,
+                'created_at': self._created_at_iso,
+                'is_private': self.is_private,
+                'max_users': self.max_users,
+                'description': self.description,
+                'member_count': len(self.members),
+                'members': list(self.members),
+                'admins': list(self.admins)
+            }
+        return self._dict_cache
 
 
 class RoomService:
@@ -59,7 +95,9 @@ class RoomService:
         """
         self._rooms: Dict[str, Room] = {}
         self._user_rooms: Dict[str, Set[str]] = {}  # user_id -> set of room_ids
+        self._room_users: Dict[str, Set[str]] = {}  # room_id -> set of user_ids
         self._history_limit = history_limit
+        self.version = 0  # Bumped whenever a room is added, removed or changed
         
         # Create default room
         self.create_room(
@@ -100,11 +138,15 @@ class RoomService:
             max_users=max_users,
             description=description
         )
+        # Bounded history: the oldest message drops off as a new one arrives
+        room.message_history = deque(maxlen=self._history_limit)
         
         # Creator is automatically an admin
-        room.admins.add(created_by)
+        room.add_admin(created_by)
         
         self._rooms[room_id] = room
+        self._room_users[room_id] = set()
+        self.version += 1
         return room
     
     def delete_room(self, room_id: str, requested_by: str) -> bool:
@@ -132,11 +174,12 @@ class RoomService:
         if requested_by not in room.admins and requested_by != room.created_by:
             raise RoomError("Only room admins can delete the room")
         
-        # Remove room from all users
-        for user_id in list(self._user_rooms.keys()):
+        # Remove room from the users in it
+        for user_id in self._room_users.pop(room_id, ()):
             self._user_rooms[user_id].discard(room_id)
         
         del self._rooms[room_id]
+        self.version += 1
         return True
     
     def join_room(self, room_id: str, user_id: str, username: str) -> Room:
@@ -162,11 +205,11 @@ class RoomService:
         if len(room.members) >= room.max_users:
             raise RoomError(f"Room '{room.name}' is full")
         
-        room.members.add(username)
+        room.add_member(username)
+        self.version += 1
         
-        if user_id not in self._user_rooms:
-            self._user_rooms[user_id] = set()
-        self._user_rooms[user_id].add(room_id)
+        self._user_rooms.setdefault(user_id, set()).add(room_id)
+        self._room_users[room_id].add(user_id)
         
         return room
     
@@ -186,10 +229,12 @@ class RoomService:
             return False
         
         room = self._rooms[room_id]
-        room.members.discard(username)
+        room.remove_member(username)
+        self.version += 1
         
         if user_id in self._user_rooms:
             self._user_rooms[user_id].discard(room_id)
+        self._room_users[room_id].discard(user_id)
         
         return True
     
@@ -204,15 +249,23 @@ class RoomService:
         Returns:
             List of room IDs the user left
         """
-        left_rooms = []
-        
-        if user_id in self._user_rooms:
-            for room_id in list(self._user_rooms[user_id]):
-                if room_id in self._rooms:
-                    self._rooms[room_id].members.discard(username)
-                    left_rooms.append(room_id)
-            del self._user_rooms[user_id]
+        room_ids = self._user_rooms.pop(user_id, None)
+        if not room_ids:
+            return []
         
+        # Local references keep attribute lookups out of the loop
+        rooms, room_users = self._rooms, self._room_users
+        left_rooms = []
+        left_append = left_rooms.append
+        for room_id in room_ids:
+            room = rooms.get(room_id)
+            if room is not None:
+                room.remove_member(username)
+                room_users[room_id].discard(user_id)
+                left_append(room_id)
+        
+        if left_rooms:
+            self.version += 1
         return left_rooms
     
     def get_room(self, room_id: str) -> Optional[Room]:
@@ -256,12 +309,7 @@ class RoomService:
         if room_id not in self._rooms:
             return
         
-        room = self._rooms[room_id]
-        room.message_history.append(message)
-        
-        # Trim history if exceeds limit
-        if len(room.message_history) > self._history_limit:
-            room.message_history = room.message_history[-self._history_limit:]
+        self._rooms[room_id].message_history.append(message)
     
     def get_message_history(self, room_id: str, limit: int = 50) -> List[dict]:
         """
@@ -278,7 +326,9 @@ class RoomService:
             return []
         
         messages = self._rooms[room_id].message_history
-        return messages[-limit:] if limit else messages
+        if not limit or limit >= len(messages):
+            return list(messages)
+        return list(islice(messages, len(messages) - limit, None))
     
     def is_user_in_room(self, room_id: str, username: str) -> bool:
         """Check if a user is in a specific room."""
@@ -306,7 +356,8 @@ class RoomService:
         if requested_by not in room.admins:
             raise RoomError("Only admins can add other admins")
         
-        room.admins.add(username)
+        room.add_admin(username)
+        self.version += 1
         return True
     
     def room_count(self) -> int:
@@ -0,0 +1,43 @@
+"""
+JSON Serializer for Socket.IO packets
+Uses orjson for fast encoding and decoding of event payloads
+"""
+import orjson
+
+
+class JSONSerializer:
+    """
+    Drop-in replacement for the stdlib json module used by Socket.IO.
+    
+    Features:
+    - orjson-backed encoding (native datetime, dataclass and float support)
+    - Accepts and ignores stdlib-only keyword arguments such as separators
+    """
+    
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        """
+        Serialize an object to a JSON string.
+        
+        Args:
+            obj: The object to serialize
+            **kwargs: Stdlib json options, ignored (orjson output is compact)
+            
+        Returns:
+            The JSON document as a string
+        """
+        return orjson.dumps(obj).decode('utf-8')
+    
+    @staticmethod
+    def loads(data, **kwargs):
+        """
+        Deserialize a JSON document.
+        
+        Args:
+            data: JSON string or bytes
+            **kwargs: Stdlib json options, ignored
+            
+        Returns:
+            The decoded Python object
+        """
+        return orjson.loads(data)
@@ -95,6 +95,11 @@ document.addEventListener("DOMContentLoaded", () => {
         displayMessage(data);
     });
 
+    // Receive batched room messages
+    socket.on("receive_message_batch", (messages) => {
+        messages.forEach((msg) => displayMessage(msg));
+    });
+
     // Legacy message format support
     socket.on("message", (msg) => {
         if (typeof msg === "string") {
@@ -274,9 +279,11 @@ document.addEventListener("DOMContentLoaded", () => {
             }`;
         if (animate) wrapper.style.animation = "fadeInUp 0.3s ease";
 
-        const time = data.timestamp
-            ? formatTime(data.timestamp)
-            : formatTime(new Date().toISOString());
+        const time = formatTime(
+            data.unix_timestamp
+                ? data.unix_timestamp * 1000
+                : data.timestamp || Date.now()
+        );
 
         if (isSystem) {
             wrapper.innerHTML = `